@@ -12,6 +12,8 @@ def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(description="Tool Agent Demo - AI with Tool Chaining")
     parser.add_argument("--config", default="config.json", help="Configuration file path")
+    parser.add_argument("--batch", action="store_true",
+                        help="Read one query per stdin line and answer them all through the Batch API")
     parser.add_argument("message", nargs="?", help="Message to send (if not provided, enters interactive mode)")
     
     args = parser.parse_args()
@@ -19,22 +21,33 @@ def main():
     # Create demo instance
     demo = ToolAgent(args.config)
     
-    # Check if message provided via stdin
-    if not sys.stdin.isatty():
-        message = sys.stdin.read().strip()
-        if message:
-            response = demo.chat(message)
+    try:
+        if args.batch:
+            # Bulk mode: one query per line, answered in input order
+            queries = [line.strip() for line in sys.stdin if line.strip()]
+            if not queries:
+                print("Error: No input provided", file=sys.stderr)
+                sys.exit(1)
+            for query, response in zip(queries, demo.chat_batch(queries)):
+                print(f"> {query}\n{response}\n")
+        # Check if message provided via stdin
+        elif not sys.stdin.isatty():
+            message = sys.stdin.read().strip()
+            if message:
+                response = demo.chat(message)
+                print(response)
+            else:
+                print("Error: No input provided", file=sys.stderr)
+                sys.exit(1)
+        elif args.message:
+            # Single message mode
+            response = demo.chat(args.message)
             print(response)
         else:
-            print("Error: No input provided", file=sys.stderr)
-            sys.exit(1)
-    elif args.message:
-        # Single message mode
-        response = demo.chat(args.message)
-        print(response)
-    else:
-        # Interactive mode
-        demo.run_interactive()
+            # Interactive mode
+            demo.run_interactive()
+    finally:
+        demo.close()
 
 
 if __name__ == "__main__":
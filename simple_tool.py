@@ -3,19 +3,314 @@
 Simple Tool classes for ToolAgent.
 """
 
+import ast
+import asyncio
+import codecs
+import contextlib
+import contextvars
+import functools
+import hashlib
+import io
+import itertools
+import json
+import operator
 import os
-from typing import Dict, Any
+import stat
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
+
+# Optional dependencies are imported once here; tools report a missing
+# package when they are used rather than failing at import time.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import make_headers
+    from urllib3.util.retry import Retry
+except ImportError:
+    requests = None
+
+try:
+    from lxml import etree, html
+except ImportError:
+    etree = html = None
+
+try:
+    from ddgs import DDGS
+except ImportError:
+    DDGS = None
+
+
+def json_loads(data):
+    """Parse JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, sort_keys=sort_keys).encode()
+
+
+# Shared HTTP session for WebFetchTool, created on first use so keep-alive
+# connections are reused across fetches instead of re-handshaking per call.
+_SESSION = None
+
+
+def _get_session():
+    """Return the module-wide requests session, creating it if needed."""
+    global _SESSION
+    if _SESSION is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.3)
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        })
+        # gzip/deflate, plus br/zstd when a decoder for them is installed
+        session.headers.update(make_headers(accept_encoding=True))
+        _SESSION = session
+    return _SESSION
+
+
+# XPath equivalents of the CSS selectors article, main, .content,
+# .post-content, .entry-content, .article-body and #content, tried in order
+_CONTENT_XPATHS = (
+    '//article',
+    '//main',
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' content ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' post-content ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' entry-content ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' article-body ')]",
+    "//*[@id='content']",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _content_selectors():
+    """Compile the content-area XPaths once, on first use."""
+    return tuple(etree.XPath(expr) for expr in _CONTENT_XPATHS)
+
+
+# Shared DuckDuckGo client for WebSearchTool, created on first use and
+# dropped after a failure so the next search starts with a fresh one.
+_DDGS = None
+
+
+def _get_ddgs():
+    """Return the module-wide DDGS client, creating it if needed."""
+    global _DDGS
+    if _DDGS is None:
+        _DDGS = DDGS()
+    return _DDGS
+
+
+# Fetches asking for at most this many characters skip the content
+# selectors; the body text is plenty for a short summary.
+_SMALL_FETCH_LENGTH = 512
+
+# Least number of HTML bytes a fetch reads. Inline scripts, styles and JSON
+# in <head> often run to hundreds of KB before any body text, so the byte
+# budget cannot shrink with max_length below this.
+_MIN_FETCH_BYTES = 2 * 1024 * 1024
+
+
+def _page_charset(headers, content: bytes) -> Optional[str]:
+    """Charset to parse a fetched page with, or None to let lxml find it.
+    
+    A known charset named in the Content-Type header wins; otherwise the
+    page is taken as UTF-8 if it decodes as such, and left to its <meta>
+    declaration if not.
+    """
+    # get_encoding_from_headers falls back to ISO-8859-1 for any text/*
+    # type, which would override a <meta charset>, so require a parameter
+    if 'charset' in headers.get('content-type', '').lower():
+        try:
+            return codecs.lookup(requests.utils.get_encoding_from_headers(headers)).name
+        except (LookupError, TypeError):
+            pass
+    try:
+        # Incremental decode tolerates a character cut at the read limit
+        codecs.getincrementaldecoder('utf-8')().decode(content)
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+
+def _extract_text(element, limit: int = None) -> str:
+    """Text of an lxml element with all whitespace runs collapsed to one space.
+    
+    With a limit, stop walking text nodes once about that many non-blank
+    characters have been collected.
+    """
+    if limit is None:
+        return ' '.join(' '.join(element.itertext()).split())
+    chunks = []
+    collected = 0
+    for text in element.itertext():
+        chunks.append(text)
+        collected += len(text.strip())
+        if collected >= limit:
+            break
+    return ' '.join(' '.join(chunks).split())
+
+
+def cached_schema(get_schema):
+    """Decorator for get_schema: build the schema once, return a read-only view."""
+    @functools.wraps(get_schema)
+    def wrapper(self) -> Mapping[str, Any]:
+        if self._schema is None:
+            self._schema = MappingProxyType(get_schema(self))
+        return self._schema
+    return wrapper
+
+
+class TTLCache:
+    """Thread-safe in-memory cache with per-entry expiry and LRU eviction."""
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value, expire: float = None):
+        expires_at = time.monotonic() + expire if expire is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# Shared cache for tool results, see cached_result()
+_RESULT_CACHE = TTLCache(maxsize=1024)
+
+# Per-chat state: a {url: text} cache shared by the web tools, and the
+# oversized results read back by retrieve_artifact. chat_state() installs
+# fresh dicts; asyncio tasks and to_thread workers inherit them through the
+# context, so concurrent chats never see each other's entries.
+_SESSION_CACHE = contextvars.ContextVar("session_cache", default=None)
+_ARTIFACT_STORE = contextvars.ContextVar("artifact_store", default=None)
+
+
+@contextlib.contextmanager
+def chat_state():
+    """Give the tools fresh per-chat state for the duration of the block."""
+    session_token = _SESSION_CACHE.set({})
+    artifact_token = _ARTIFACT_STORE.set({})
+    try:
+        yield
+    finally:
+        _ARTIFACT_STORE.reset(artifact_token)
+        _SESSION_CACHE.reset(session_token)
+
+
+def store_artifact(content: str) -> Optional[str]:
+    """Keep content in the current chat's artifact store and return its id.
+    
+    Returns None outside chat_state(), where there is nowhere to keep it.
+    """
+    store = _ARTIFACT_STORE.get()
+    if store is None:
+        return None
+    artifact_id = hashlib.sha1(content.encode()).hexdigest()[:8]
+    store[artifact_id] = content
+    return artifact_id
+
+
+def set_result_cache(cache):
+    """Replace the shared tool-result cache.
+    
+    Any object with get(key) and set(key, value, expire=seconds) works, such
+    as a diskcache.Cache to keep results across runs.
+    """
+    global _RESULT_CACHE
+    _RESULT_CACHE = cache
+
+
+def _cache_key(tool_name: str, arguments: Dict[str, Any], version=None) -> str:
+    """Stable digest of a tool call's name, arguments and source version."""
+    payload = json_dumps({"t": tool_name, "a": dict(arguments), "v": version}, sort_keys=True)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def cached_result(ttl: float, version=None):
+    """Decorator for execute: reuse successful results for ttl seconds.
+    
+    version, if given, is called with (self, arguments) and its value is
+    part of the cache key, so results are dropped when the source changes;
+    a None version bypasses the cache.
+    """
+    def decorator(execute):
+        # Keyed by method as well as tool, since a tool may cache several
+        suffix = "." + execute.__name__
+        
+        @functools.wraps(execute)
+        def wrapper(self, arguments: Dict[str, Any]) -> str:
+            if version is None:
+                key = _cache_key(self.name + suffix, arguments)
+            else:
+                source_version = version(self, arguments)
+                if source_version is None:
+                    return execute(self, arguments)
+                key = _cache_key(self.name + suffix, arguments, source_version)
+            result = _RESULT_CACHE.get(key)
+            if result is None:
+                result = execute(self, arguments)
+                # Errors are often transient, so never cache them
+                if not result.startswith("Error"):
+                    _RESULT_CACHE.set(key, result, expire=ttl)
+            return result
+        return wrapper
+    return decorator
+
 
 class SimpleTool:
     """Base class for simple tools."""
     
+    __slots__ = ('name', 'description', '_schema')
+    
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
+        self._schema = None
     
     def execute(self, arguments: Dict[str, Any]) -> str:
         raise NotImplementedError
     
+    async def execute_async(self, arguments: Dict[str, Any]) -> str:
+        """Run execute() in a worker thread so several tool calls can overlap."""
+        return await asyncio.to_thread(self.execute, arguments)
+    
+    @cached_schema
     def get_schema(self) -> Dict[str, Any]:
         return {
             "type": "function",
@@ -27,62 +322,143 @@ class SimpleTool:
         }
 
 
+# Lines longer than this are cut short so one huge line cannot blow up a read
+_MAX_LINE_CHARS = 4096
+
+
+def _read_lines(f, limit: int):
+    """Yield the lines of a text file, each cut to at most limit characters.
+    
+    The rest of an overlong line is read and dropped, so every yielded
+    line is one line of the file.
+    """
+    read_line = functools.partial(f.readline, limit)
+    for line in iter(read_line, ''):
+        if len(line) == limit and not line.endswith('\n'):
+            rest = read_line()
+            cut = rest not in ('', '\n')
+            while rest and not rest.endswith('\n'):
+                rest = read_line()
+            if cut:
+                line += "...[line truncated]"
+        yield line
+
+
+def _count_lines(path: str) -> int:
+    """Count the lines in a file by scanning it in 1 MB binary blocks."""
+    count = 0
+    last_block = b''
+    with open(path, 'rb') as f:
+        for block in iter(functools.partial(f.read, 1 << 20), b''):
+            count += block.count(b'\n')
+            last_block = block
+    if last_block and not last_block.endswith(b'\n'):
+        count += 1
+    return count
+
+
+def _file_version(tool, arguments: Dict[str, Any]):
+    """Resolved path, modification time and size of the file a read targets.
+    
+    None, which bypasses the cache, when the path is outside the tool's
+    directory, so a cached read is never served where execute would refuse.
+    """
+    try:
+        abs_path = os.path.realpath(arguments.get("path", ""))
+        if not tool._allows(abs_path):
+            return None
+        st = os.stat(abs_path)
+    except (OSError, ValueError):
+        return None
+    return [abs_path, st.st_mtime_ns, st.st_size]
+
+
 class FileReaderTool(SimpleTool):
     """Simple file reading tool."""
     
+    __slots__ = ('_cwd',)
+    
     def __init__(self):
         super().__init__(
             "file_reader", 
             "Read content from a text file"
         )
+        # Resolved once; reads are confined to this directory tree
+        # join() adds a trailing separator only when missing, so "/" stays "/"
+        self._cwd = os.path.join(os.path.realpath(os.getcwd()), '')
     
+    def _allows(self, abs_path: str) -> bool:
+        """Whether a resolved path is inside the current directory tree."""
+        return abs_path == self._cwd[:-1] or abs_path.startswith(self._cwd)
+    
+    # Keyed on the resolved path and the file's mtime and size, so an edit
+    # is seen immediately
+    @cached_result(ttl=3600, version=_file_version)
     def execute(self, arguments: Dict[str, Any]) -> str:
         path = arguments.get("path", "")
         max_lines = int(arguments.get("max_lines", 100))
+        count_total = bool(arguments.get("count_total", False))
         
         if not path:
             return "Error: No file path provided"
         
         try:
             # Security check - only allow current directory and subdirectories
-            abs_path = os.path.abspath(path)
-            cwd = os.path.abspath(os.getcwd())
-            if not abs_path.startswith(cwd):
+            abs_path = os.path.realpath(path)
+            if not self._allows(abs_path):
                 return f"Error: Access denied - path outside current directory"
             
-            if not os.path.exists(path):
+            # One stat call answers both "does it exist" and "is it a file"
+            try:
+                st = os.stat(abs_path)
+            except FileNotFoundError:
                 return f"Error: File '{path}' not found"
             
-            if not os.path.isfile(path):
+            if not stat.S_ISREG(st.st_mode):
                 return f"Error: '{path}' is not a file"
             
             # Check if it's a text file
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    lines = []
-                    for i, line in enumerate(f):
-                        if i >= max_lines:
-                            break
-                        lines.append(line.rstrip())
-                    
-                    content = '\n'.join(lines)
-                    total_lines = i + 1  # Total lines in file
-                    
-                    result = f"📄 File: {path}\n"
-                    result += f"📊 Lines read: {len(lines)}/{total_lines}\n"
-                    if total_lines > max_lines:
-                        result += f"⚠️  Output limited to {max_lines} lines\n"
-                    result += f"{'='*50}\n"
-                    result += content
-                    
-                    return result
+                with open(abs_path, 'rb') as fb:
+                    # Sniff the first block so binaries are rejected without
+                    # reading and decoding the rest of the file
+                    head = fb.read(8192)
+                    if b'\x00' in head:
+                        return f"Error: '{path}' appears to be a binary file"
+                    # Incremental decode tolerates a character cut at the edge
+                    codecs.getincrementaldecoder('utf-8')().decode(head)
+                    fb.seek(0)
                     
+                    # Stop exactly after max_lines (one extra tells us whether
+                    # the file goes on); very long lines are cut short
+                    with io.TextIOWrapper(fb, encoding='utf-8') as f:
+                        lines = list(itertools.islice(_read_lines(f, _MAX_LINE_CHARS), max_lines + 1))
+                
+                truncated = len(lines) > max_lines
+                lines = lines[:max_lines]
+                if not truncated:
+                    lines_info = f"{len(lines)}/{len(lines)}"
+                elif count_total:
+                    lines_info = f"{len(lines)}/{_count_lines(abs_path)}"
+                else:
+                    lines_info = f"{len(lines)} (file continues)"
+                content = '\n'.join(line.rstrip() for line in lines)
+                
+                parts = [f"📄 File: {path}\n", f"📊 Lines read: {lines_info}\n"]
+                if truncated:
+                    parts.append(f"⚠️  Output limited to {max_lines} lines\n")
+                parts.append(f"{'='*50}\n")
+                parts.append(content)
+                
+                return ''.join(parts)
+                
             except UnicodeDecodeError:
                 return f"Error: '{path}' appears to be a binary file"
                 
         except Exception as e:
             return f"Error reading file: {str(e)}"
     
+    @cached_schema
     def get_schema(self) -> Dict[str, Any]:
         return {
             "type": "function",
@@ -100,6 +476,11 @@ class FileReaderTool(SimpleTool):
                             "type": "integer",
                             "description": "Maximum number of lines to read (default: 100)",
                             "default": 100
+                        },
+                        "count_total": {
+                            "type": "boolean",
+                            "description": "Also count every line in the file when it is longer than max_lines (default: false)",
+                            "default": False
                         }
                     },
                     "required": ["path"]
@@ -109,7 +490,14 @@ class FileReaderTool(SimpleTool):
 
 
 class WebSearchTool(SimpleTool):
-    """Web search tool using duckduckgo-search (ddgs)."""
+    """Web search tool using duckduckgo-search (ddgs).
+    
+    Within chat_state(), each result's snippet is stored in the chat's
+    session cache under its URL so web_fetch can answer from it. That
+    happens outside the result cache, so cached searches fill it too.
+    """
+    
+    __slots__ = ()
     
     def __init__(self):
         super().__init__(
@@ -119,42 +507,57 @@ class WebSearchTool(SimpleTool):
     
     def execute(self, arguments: Dict[str, Any]) -> str:
         query = arguments.get("query", "")
-        max_results = int(arguments.get("max_results", 5))
         
         if not query:
             return "Error: No search query provided"
         
+        results = self._search(arguments)
+        if results.startswith("Error"):
+            return results
+        results = json_loads(results)
+        session_cache = _SESSION_CACHE.get()
+        
+        # Format results
+        parts = [f"🔍 Web Search: '{query}'\n", f"{'='*50}\n"]
+        
+        if results:
+            for i, item in enumerate(results, 1):
+                title = item.get('title', 'No title')
+                url = item.get('href', 'No URL')
+                snippet = item.get('body', 'No description')
+                if session_cache is not None and 'href' in item and 'body' in item:
+                    session_cache.setdefault(url, snippet)
+                
+                parts.append(f"  {i}. {title}\n     {url}\n     {snippet}\n\n")
+        else:
+            parts.append("No results found. Try a different search term.\n")
+        
+        return ''.join(parts)
+    
+    @cached_result(ttl=3600)
+    def _search(self, arguments: Dict[str, Any]) -> str:
+        """Run the search; the results as a JSON list, or an error message."""
+        query = arguments.get("query", "")
+        max_results = int(arguments.get("max_results", 5))
+        
         try:
-            try:
-                from ddgs import DDGS
-            except ImportError:
+            if DDGS is None:
                 return "Error: ddgs package not installed. Install with: pip install ddgs"
             
-            with DDGS() as ddgs:
+            try:
                 # Perform text search
-                results = list(ddgs.text(query, max_results=max_results))
+                results = list(_get_ddgs().text(query, max_results=max_results))
+            except Exception:
+                global _DDGS
+                _DDGS = None
+                raise
             
-            # Format results
-            result = f"🔍 Web Search: '{query}'\n"
-            result += f"{'='*50}\n"
-            
-            if results:
-                for i, item in enumerate(results, 1):
-                    title = item.get('title', 'No title')
-                    url = item.get('href', 'No URL')
-                    snippet = item.get('body', 'No description')
-                    
-                    result += f"  {i}. {title}\n"
-                    result += f"     {url}\n"
-                    result += f"     {snippet}\n\n"
-            else:
-                result += "No results found. Try a different search term.\n"
-            
-            return result
+            return json_dumps(results).decode()
             
         except Exception as e:
             return f"Error performing web search: {str(e)}"
     
+    @cached_schema
     def get_schema(self) -> Dict[str, Any]:
         return {
             "type": "function",
@@ -180,8 +583,29 @@ class WebSearchTool(SimpleTool):
         }
 
 
+def _format_fetch(url: str, content: str, max_length: int) -> str:
+    """WebFetchTool output for already-extracted page text."""
+    if len(content) > max_length:
+        content = content[:max_length] + "...[content truncated]"
+    return ''.join((
+        f"🌐 Web Fetch: {url}\n",
+        f"{'='*50}\n",
+        f"📄 Content ({len(content)} characters):\n\n",
+        content,
+    ))
+
+
 class WebFetchTool(SimpleTool):
-    """Web fetch tool for retrieving content from URLs."""
+    """Web fetch tool for retrieving content from URLs.
+    
+    Within chat_state(), a URL whose text (or search snippet) is already in
+    the chat's session cache and at least max_length long is answered
+    without a request, and fetched text is stored for later calls. Both
+    happen outside the result cache, so answers served from the session
+    never outlive the chat.
+    """
+    
+    __slots__ = ()
     
     def __init__(self):
         super().__init__(
@@ -200,68 +624,88 @@ class WebFetchTool(SimpleTool):
         if not (url.startswith('http://') or url.startswith('https://')):
             return "Error: URL must start with http:// or https://"
         
+        session_cache = _SESSION_CACHE.get()
+        if session_cache is not None:
+            cached = session_cache.get(url)
+            if cached is not None and len(cached) >= max_length:
+                return _format_fetch(url, cached, max_length)
+        
+        content = self._fetch(arguments)
+        if content.startswith("Error"):
+            return content
+        content = json_loads(content)
+        if session_cache is not None:
+            session_cache[url] = content
+        
+        # Limit content length and format result
+        return _format_fetch(url, content, max_length)
+    
+    @cached_result(ttl=3600)
+    def _fetch(self, arguments: Dict[str, Any]) -> str:
+        """Download the page and extract its main text.
+        
+        Returns the text as a JSON string, or an error message.
+        """
+        url = arguments.get("url", "")
+        max_length = int(arguments.get("max_length", 5000))
+        
         try:
-            # Try to import required libraries
-            try:
-                import requests
-                from bs4 import BeautifulSoup
-            except ImportError as e:
-                missing_lib = str(e).split("'")[1]
+            # Check required libraries
+            missing_lib = "requests" if requests is None else "lxml" if html is None else None
+            if missing_lib:
                 return f"Error: {missing_lib} package not installed. Install with: pip install {missing_lib}"
             
-            # Fetch the webpage
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            # Parse HTML content
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+            # Fetch the webpage, streaming at most a bounded number of bytes
+            # so a huge or endless response cannot exhaust memory
+            read_limit = max(max_length * 8, _MIN_FETCH_BYTES)
+            response = _get_session().get(url, timeout=10, stream=True)
+            try:
+                response.raise_for_status()
+                content = response.raw.read(read_limit, decode_content=True)
+                capped = len(content) >= read_limit
+            finally:
+                response.close()
             
-            # Extract text from common content areas
-            content_selectors = [
-                'article', 'main', '.content', '.post-content', 
-                '.entry-content', '.article-body', '#content'
-            ]
+            # Parse HTML content in the page's charset; on its own lxml only
+            # looks for one in <meta> and would misread the rest
+            encoding = _page_charset(response.headers, content)
+            if encoding is None:
+                tree = html.fromstring(content)
+            else:
+                tree = html.fromstring(content, parser=html.HTMLParser(encoding=encoding))
             
-            main_content = ""
-            for selector in content_selectors:
-                element = soup.select_one(selector)
-                if element:
-                    main_content = element.get_text(separator=' ', strip=True)
-                    break
+            # Remove script, style and noscript elements in one C-level pass
+            etree.strip_elements(tree, 'script', 'style', 'noscript', with_tail=False)
             
-            # Fallback to body if no main content found
-            if not main_content:
-                main_content = soup.get_text(separator=' ', strip=True)
+            # Extract text from common content areas, never walking much
+            # more text than the truncated output can hold
+            text_limit = max_length * 2
+            content = ""
+            if max_length > _SMALL_FETCH_LENGTH:
+                for selector in _content_selectors():
+                    elements = selector(tree)
+                    if elements:
+                        content = _extract_text(elements[0], text_limit)
+                        break
             
-            # Clean up whitespace
-            lines = [line.strip() for line in main_content.split('\n') if line.strip()]
-            content = '\n'.join(lines)
+            # Fallback to body if no main content found, skipping <head>
+            if not content:
+                body = tree.find('body')
+                content = _extract_text(body if body is not None else tree, text_limit)
             
-            # Limit content length
-            if len(content) > max_length:
-                content = content[:max_length] + "...[content truncated]"
+            # The limit fell before any body text, say inside a huge <head>;
+            # report it as an error so it is not cached as an empty page
+            if not content and capped:
+                return f"Error: No page text within the first {read_limit} bytes of {url}"
             
-            # Format result
-            result = f"🌐 Web Fetch: {url}\n"
-            result += f"{'='*50}\n"
-            result += f"📄 Content ({len(content)} characters):\n\n"
-            result += content
-            
-            return result
+            return json_dumps(content).decode()
             
         except requests.exceptions.RequestException as e:
             return f"Error fetching URL: {str(e)}"
         except Exception as e:
             return f"Error processing web page: {str(e)}"
     
+    @cached_schema
     def get_schema(self) -> Dict[str, Any]:
         return {
             "type": "function",
@@ -287,9 +731,69 @@ class WebFetchTool(SimpleTool):
         }
 
 
+_MAX_EXPRESSION_LENGTH = 256
+
+# Deletes every character an arithmetic expression may contain (digits,
+# operators, parentheses, exponent/separator letters and blanks); anything
+# left over is invalid, found in one C-level pass before parsing.
+_EXPR_DELETE = str.maketrans('', '', '0123456789+-*/%.()eE_ \t')
+
+# Integer powers whose result would exceed this many bits are refused
+_MAX_POWER_BITS = 10000
+
+
+def _safe_pow(base, exponent):
+    """Exponentiation that refuses results too large to be useful."""
+    if (isinstance(base, int) and isinstance(exponent, int) and exponent > 0
+            and abs(base).bit_length() * exponent > _MAX_POWER_BITS):
+        raise ValueError("result too large")
+    result = operator.pow(base, exponent)
+    if isinstance(result, complex):
+        raise ValueError("result is not a real number")
+    return result
+
+
+# Operators the calculator understands; every other node type is rejected
+# when the expression is compiled.
+_SAFE_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _safe_pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_SAFE_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, *_SAFE_OPS)
+
+
+@functools.lru_cache(maxsize=512)
+def _compile_expression(expression: str) -> ast.AST:
+    """Parse and validate an arithmetic expression once, caching its AST."""
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _SAFE_NODES) or (
+                isinstance(node, ast.Constant) and type(node.value) not in (int, float)):
+            raise ValueError("only numbers and + - * / // % ** ( ) are allowed")
+    return tree.body
+
+
+def _eval_node(node: ast.AST):
+    """Evaluate an AST already validated by _compile_expression."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.BinOp):
+        return _SAFE_OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    return _SAFE_OPS[type(node.op)](_eval_node(node.operand))
+
+
 class CalculatorTool(SimpleTool):
     """Simple calculator tool."""
     
+    __slots__ = ()
+    
     def __init__(self):
         super().__init__(
             "calculator",
@@ -303,19 +807,22 @@ class CalculatorTool(SimpleTool):
             return "Error: No mathematical expression provided"
         
         try:
-            # Security: Only allow safe mathematical operations
-            allowed_chars = set('0123456789+-*/.() ')
-            if not all(c in allowed_chars for c in expression):
+            # Security: Only allow safe mathematical operations, enforced on
+            # the parsed expression rather than its characters
+            if len(expression) > _MAX_EXPRESSION_LENGTH:
+                return f"Error: Expression longer than {_MAX_EXPRESSION_LENGTH} characters"
+            if expression.translate(_EXPR_DELETE):
                 return "Error: Invalid characters in expression"
             
             # Evaluate the expression safely
-            result = eval(expression)
+            result = _eval_node(_compile_expression(expression))
             
             return f"🧮 Calculator: {expression} = {result}"
             
         except Exception as e:
             return f"Error calculating: {str(e)}"
     
+    @cached_schema
     def get_schema(self) -> Dict[str, Any]:
         return {
             "type": "function",
@@ -334,3 +841,70 @@ class CalculatorTool(SimpleTool):
                 }
             }
         }
+
+
+class ArtifactTool(SimpleTool):
+    """Read back tool results that were too large to keep in the conversation.
+    
+    The agent keeps oversized results with store_artifact() under a short
+    id and shows the model only a preview; this tool returns any slice of
+    them from the current chat's store.
+    """
+    
+    __slots__ = ()
+    
+    def __init__(self):
+        super().__init__(
+            "retrieve_artifact",
+            "Read part of an earlier tool result that was shortened to a preview"
+        )
+    
+    def execute(self, arguments: Dict[str, Any]) -> str:
+        artifact_id = arguments.get("id", "")
+        offset = max(int(arguments.get("offset", 0)), 0)
+        max_length = int(arguments.get("max_length", 3000))
+        
+        if not artifact_id:
+            return "Error: No artifact id provided"
+        
+        artifact = (_ARTIFACT_STORE.get() or {}).get(artifact_id)
+        if artifact is None:
+            return f"Error: Unknown artifact id '{artifact_id}'"
+        
+        content = artifact[offset:offset + max_length]
+        end = offset + len(content)
+        return ''.join((
+            f"📦 Artifact {artifact_id}: characters {offset}-{end} of {len(artifact)}\n\n",
+            content,
+            f"\n...[{len(artifact) - end} more characters]" if end < len(artifact) else "",
+        ))
+    
+    @cached_schema
+    def get_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "id": {
+                            "type": "string",
+                            "description": "Artifact id given in the shortened result"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "Character offset to start reading from (default: 0)",
+                            "default": 0
+                        },
+                        "max_length": {
+                            "type": "integer",
+                            "description": "Maximum number of characters to return (default: 3000)",
+                            "default": 3000
+                        }
+                    },
+                    "required": ["id"]
+                }
+            }
+        }
@@ -6,45 +6,275 @@ A minimal demonstration of AI tool chaining for Hackforge.
 Features: OpenAI integration, tool calls, round management, stdin input.
 """
 
+import asyncio
+import functools
 import json
+import math
+import operator
 import sys
 import os
-from simple_tool import FileReaderTool, WebSearchTool, WebFetchTool, CalculatorTool
-from typing import Dict, List, Any, Optional
+import time
+from collections import deque
+from types import MappingProxyType
+from simple_tool import (
+    FileReaderTool, WebSearchTool, WebFetchTool, CalculatorTool, ArtifactTool,
+    TTLCache, chat_state, json_dumps, json_loads, set_result_cache, store_artifact
+)
+from typing import Callable, Dict, List, Any, Mapping, Optional, Tuple
+
+# Optional: tool-call arguments are checked against compiled schemas when
+# fastjsonschema is installed, and passed through unchecked otherwise.
 try:
-    from openai import OpenAI
+    import fastjsonschema
 except ImportError:
-    print("Error: openai package not found. Install with: pip install openai")
-    sys.exit(1)
+    fastjsonschema = None
+
+
+@functools.lru_cache(maxsize=8)
+def _read_config(config_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a config file; mtime_ns is part of the cache key so edits reload."""
+    with open(config_path, 'rb') as f:
+        return json_loads(f.read())
+
+
+_NO_ARGUMENTS = MappingProxyType({})
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_arguments(arguments_str: str) -> Mapping[str, Any]:
+    """Parse a tool call's JSON arguments once per distinct string.
+    
+    The result is shared between calls, so it is returned read-only.
+    Malformed or non-object arguments parse as empty.
+    """
+    try:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        arguments = json_loads(arguments_str)
+    except json.JSONDecodeError:
+        return _NO_ARGUMENTS
+    return MappingProxyType(arguments) if isinstance(arguments, dict) else _NO_ARGUMENTS
+
+
+class SemanticCache:
+    """Reuse answers to near-duplicate questions, matched by embedding similarity."""
+    
+    def __init__(self, client, model: str, threshold: float = 0.92,
+                 path: Optional[str] = None, max_entries: int = 500):
+        self.client = client
+        self.model = model
+        self.threshold = threshold
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = []
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    self.entries = json_loads(f.read())
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not load response cache '{path}': {e}")
+    
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Return the unit-length embedding of text, or None if unavailable."""
+        try:
+            response = await self.client.embeddings.create(model=self.model, input=text)
+        except Exception as e:
+            print(f"Warning: Embedding request failed, skipping response cache: {e}")
+            return None
+        vector = response.data[0].embedding
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+    
+    def lookup(self, embedding: List[float]) -> Optional[str]:
+        """Return the cached response most similar to embedding above the threshold."""
+        best_response, best_similarity = None, self.threshold
+        for entry in self.entries:
+            # Embeddings are normalized, so the dot product is the cosine similarity
+            similarity = sum(map(operator.mul, embedding, entry["embedding"]))
+            if similarity >= best_similarity:
+                best_response, best_similarity = entry["response"], similarity
+        return best_response
+    
+    def add(self, message: str, embedding: List[float], response: str):
+        """Store a response and persist the cache if it has a path."""
+        self.entries.append({"message": message, "embedding": embedding, "response": response})
+        del self.entries[:-self.max_entries]
+        if self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, 'wb') as f:
+                    f.write(json_dumps(self.entries))
+            except OSError as e:
+                print(f"Warning: Could not save response cache '{self.path}': {e}")
+
+
+class RateLimiter:
+    """Keep completion requests under per-minute request and token limits.
+    
+    Requests are recorded in a sliding one-minute window; acquire() waits
+    until the window has room instead of letting the API answer with 429s.
+    A limit of 0 disables that check.
+    """
+    
+    WINDOW_SECONDS = 60.0
+    
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()  # (monotonic timestamp, tokens) per request
+        self.window_tokens = 0
+    
+    def _delay(self, tokens: int, now: float) -> float:
+        """Seconds until a request of this size fits in the window."""
+        while self.window and now - self.window[0][0] >= self.WINDOW_SECONDS:
+            self.window_tokens -= self.window.popleft()[1]
+        if not self.window:
+            return 0.0
+        if self.requests_per_minute and len(self.window) >= self.requests_per_minute:
+            return self.window[0][0] + self.WINDOW_SECONDS - now
+        if self.tokens_per_minute and self.window_tokens + tokens > self.tokens_per_minute:
+            # Wait for enough of the oldest requests to age out
+            freed = self.window_tokens + tokens - self.tokens_per_minute
+            for timestamp, used in self.window:
+                freed -= used
+                if freed <= 0:
+                    break
+            return timestamp + self.WINDOW_SECONDS - now
+        return 0.0
+    
+    async def acquire(self, tokens: int):
+        """Wait until a request of about this many prompt tokens may be sent."""
+        while True:
+            now = time.monotonic()
+            delay = self._delay(tokens, now)
+            if delay <= 0:
+                self.window.append((now, tokens))
+                self.window_tokens += tokens
+                return
+            await asyncio.sleep(delay)
 
 
 class ToolAgent:
     """Main class for ToolAgent CLI."""
     
+    # History compaction: rounds kept verbatim and the size old tool results shrink to
+    KEEP_RECENT_ROUNDS = 2
+    COMPACTED_RESULT_CHARS = 500
+    
+    # Tool results longer than this are kept aside as artifacts and only a
+    # preview goes into the conversation; retrieve_artifact reads the rest
+    ARTIFACT_THRESHOLD = 4000
+    ARTIFACT_PREVIEW_CHARS = 1500
+    
+    # Argument shown for each tool's calls in the progress log
+    DISPLAY_FIELD = {
+        "file_reader": "path",
+        "web_search": "query",
+        "web_fetch": "url",
+        "calculator": "expression",
+        "retrieve_artifact": "id"
+    }
+    
+    # Batch API polling: seconds before the first status check and between the slowest ones
+    BATCH_POLL_INITIAL = 2.0
+    BATCH_POLL_MAX = 60.0
+    
     def __init__(self, config_path: str = "config.json"):
+        self.config_path = config_path
         self.config = self._load_config(config_path)
-        self.client = OpenAI(
+        
+        # Imported here so importing this module (e.g. for the tools) does
+        # not load the openai package
+        try:
+            from openai import AsyncOpenAI
+        except ImportError:
+            print("Error: openai package not found. Install with: pip install openai")
+            sys.exit(1)
+        self.client = AsyncOpenAI(
             api_key=os.environ.get("LLM_API_KEY"),
             base_url=os.environ.get("LLM_BASE_URL")
         )
+        # Event loop behind the sync chat() wrapper, created on first use
+        self._loop = None
         
-        # Initialize tools
+        # Initialize tools; per-chat state such as the session cache and
+        # artifact store comes from chat_state() around each chat
         self.tools = {
             "file_reader": FileReaderTool(),
             "web_search": WebSearchTool(),
             "web_fetch": WebFetchTool(),
-            "calculator": CalculatorTool()
+            "calculator": CalculatorTool(),
+            "retrieve_artifact": ArtifactTool()
+        }
+        # The tool set is fixed per agent, so build the schema tuple and the
+        # name -> bound execute_async dispatch table once
+        self.tool_schemas = tuple(tool.get_schema() for tool in self.tools.values())
+        self._dispatch = {name: tool.execute_async for name, tool in self.tools.items()}
+        self._validators = {} if fastjsonschema is None else {
+            name: fastjsonschema.compile(tool.get_schema()["function"]["parameters"], use_default=False)
+            for name, tool in self.tools.items()
         }
+        # Integer parameters, whose numeric-string values are converted
+        # before validation: models often quote numbers, as in "3"
+        self._integer_params = {
+            name: tuple(
+                param for param, spec in tool.get_schema()["function"]["parameters"].get("properties", {}).items()
+                if spec.get("type") == "integer"
+            )
+            for name, tool in self.tools.items()
+        }
+        # The Responses API takes the function fields flattened into the tool
+        self._response_tools = tuple(
+            {"type": "function", **schema["function"]} for schema in self.tool_schemas
+        )
         
-        # Round management
-        self.max_rounds = self.config.get("max_rounds", 5)
+        self._setup_result_cache()
+        self._setup_response_cache()
+        self.rate_limiter = RateLimiter()
+        self._apply_settings()
         self.current_round = 0
     
+    def _setup_result_cache(self):
+        """Share one persistent result cache across tools when configured."""
+        cache_dir = self.config.get("cache_dir")
+        if cache_dir:
+            try:
+                import diskcache
+                set_result_cache(diskcache.Cache(cache_dir))
+            except ImportError:
+                print("Warning: diskcache package not found, caching tool results in memory only. Install with: pip install diskcache")
+    
+    def _setup_response_cache(self):
+        """Optional semantic cache of final answers, keyed by the user message."""
+        self.response_cache = None
+        semantic_cache = self.config.get("semantic_cache")
+        if semantic_cache:
+            self.response_cache = SemanticCache(
+                self.client,
+                model=semantic_cache.get("model", "text-embedding-3-small"),
+                threshold=semantic_cache.get("threshold", 0.92),
+                path=semantic_cache.get("path")
+            )
+    
+    def _apply_settings(self):
+        """Copy round management and rate limits from the config."""
+        # Keys missing from a config file take the built-in defaults, so a
+        # partial config.json behaves like no config file for those keys
+        config = {**self._get_default_config(), **self.config}
+        self.max_rounds = config["max_rounds"]
+        self.max_concurrent_tools = config["max_concurrent_tools"]
+        self.context_token_budget = config["context_token_budget"]
+        self.use_responses_api = config["use_responses_api"]
+        self.rate_limiter.requests_per_minute = config["requests_per_minute"]
+        self.rate_limiter.tokens_per_minute = config["tokens_per_minute"]
+        # Every chat starts with this same dict; it is never mutated, so
+        # conversations share it instead of each building their own
+        self._system_msg = {"role": "system", "content": self.config["system_prompt"]}
+    
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from JSON file."""
         try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
+            mtime_ns = os.stat(config_path).st_mtime_ns
+            return dict(_read_config(config_path, mtime_ns))
         except FileNotFoundError:
             print(f"Warning: Config file '{config_path}' not found, using defaults")
             return self._get_default_config()
@@ -52,13 +282,42 @@ class ToolAgent:
             print(f"Error: Invalid JSON in config file: {e}")
             return self._get_default_config()
     
+    def _reload_config(self):
+        """Pick up edits to the config file; free when it has not changed.
+        
+        A missing file, or one caught mid-edit with invalid JSON, keeps the
+        current config. Changed cache_dir and semantic_cache sections
+        rebuild their caches.
+        """
+        try:
+            mtime_ns = os.stat(self.config_path).st_mtime_ns
+            config = dict(_read_config(self.config_path, mtime_ns))
+        except (OSError, json.JSONDecodeError):
+            return
+        if config == self.config:
+            return
+        previous, self.config = self.config, config
+        self._apply_settings()
+        if config.get("cache_dir") != previous.get("cache_dir"):
+            if config.get("cache_dir"):
+                self._setup_result_cache()
+            else:
+                set_result_cache(TTLCache(maxsize=1024))
+        if config.get("semantic_cache") != previous.get("semantic_cache"):
+            self._setup_response_cache()
+    
     def _get_default_config(self) -> Dict[str, Any]:
         """Get default configuration."""
         return {
             "model": "moonshotai/Kimi-K2-Instruct",
             "temperature": 0.7,
             "system_prompt": "You are a helpful AI assistant with access to tools. Use tools when helpful to provide accurate, current information. If you have already provided a complete answer and no new information is available, respond with exactly '' to signal completion. Do not repeat the same answer multiple times.",
-            "max_rounds": 5
+            "max_rounds": 5,
+            "max_concurrent_tools": 8,
+            "context_token_budget": 6000,
+            "requests_per_minute": 60,
+            "tokens_per_minute": 100000,
+            "use_responses_api": False
         }
     
     def _show_progress(self, round_num: int, message: str):
@@ -66,121 +325,418 @@ class ToolAgent:
         print(f"🔄 Round {round_num}/{self.max_rounds}: {message}")
     
     
-    def _execute_tool_calls(self, tool_calls: List[Dict]) -> List[Dict[str, Any]]:
-        """Execute tool calls and return results."""
-        results = []
+    def _estimate_tokens(self, messages: List[Dict]) -> int:
+        """Rough prompt size in tokens, at about four characters per token."""
+        return sum(len(m.get("content") or "") for m in messages) // 4
+    
+    def _compact_history(self, messages: List[Dict]):
+        """Shrink old tool results once the prompt outgrows the token budget.
         
-        for tool_call in tool_calls:
-            tool_name = tool_call.get("function", {}).get("name")
-            arguments_str = tool_call.get("function", {}).get("arguments", "{}")
-            
+        The system prompt, the user message and the last KEEP_RECENT_ROUNDS
+        tool rounds are left untouched.
+        """
+        if self._estimate_tokens(messages) <= self.context_token_budget:
+            return
+        round_starts = [i for i, m in enumerate(messages)
+                        if m["role"] == "assistant" and m.get("tool_calls")]
+        if len(round_starts) <= self.KEEP_RECENT_ROUNDS:
+            return
+        for m in messages[2:round_starts[-self.KEEP_RECENT_ROUNDS]]:
+            if m["role"] == "tool" and len(m["content"]) > self.COMPACTED_RESULT_CHARS:
+                # Keep an artifact preview's closing note, which holds the
+                # only copy of the id needed to read the artifact back
+                note = m["content"][m["content"].rfind("\n...["):]
+                if "call retrieve_artifact with id" not in note:
+                    note = "...[truncated to save context]"
+                m["content"] = m["content"][:self.COMPACTED_RESULT_CHARS] + note
+    
+    async def _execute_tool_call(self, tool_call: Dict, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Execute a single tool call and return its result."""
+        function = tool_call.get("function") or {}
+        tool_name = function.get("name")
+        arguments = _parse_arguments(function.get("arguments", "{}"))
+        call_id = tool_call.get("id")
+        
+        execute = self._dispatch.get(tool_name)
+        if execute is None:
+            return {
+                "tool_call_id": call_id,
+                "name": tool_name,
+                "content": f"Error: Tool '{tool_name}' not found"
+            }
+        
+        # Reject bad arguments before running the tool, which may hit the network
+        validate = self._validators.get(tool_name)
+        if validate is not None:
+            arguments = self._coerce_integers(tool_name, arguments)
             try:
-                arguments = json.loads(arguments_str)
-            except json.JSONDecodeError:
-                arguments = {}
-            
-            if tool_name not in self.tools:
-                results.append({
-                    "tool_call_id": tool_call.get("id"),
+                validate(dict(arguments))
+            except fastjsonschema.JsonSchemaException as e:
+                self._log_tool_call(tool_name, arguments, " (invalid arguments)")
+                return {
+                    "tool_call_id": call_id,
                     "name": tool_name,
-                    "content": f"Error: Tool '{tool_name}' not found"
-                })
-                continue
-            
-            # Execute the tool
-            tool = self.tools[tool_name]
-            tool_result = tool.execute(arguments)
-            
-            print(f"  🛠️  {tool_name}: {arguments.get('path', arguments.get('query', arguments.get('expression', 'executing')))}")
-            
-            results.append({
-                "tool_call_id": tool_call.get("id"),
-                "name": tool_name,
-                "content": tool_result
-            })
+                    "content": f"Error: Invalid arguments for tool '{tool_name}': {e.message}"
+                }
+        
+        # Execute the tool
+        async with semaphore:
+            try:
+                tool_result = await execute(arguments)
+            except Exception as e:
+                tool_result = f"Error: Tool '{tool_name}' failed: {str(e)}"
+        
+        if len(tool_result) > self.ARTIFACT_THRESHOLD and tool_name != "retrieve_artifact":
+            tool_result = self._store_artifact(tool_result)
+        
+        self._log_tool_call(tool_name, arguments)
+        
+        return {
+            "tool_call_id": call_id,
+            "name": tool_name,
+            "content": tool_result
+        }
+    
+    def _coerce_integers(self, tool_name: str, arguments: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Convert numeric-string values of a tool's integer parameters to int.
+        
+        Returns arguments itself when nothing needs converting.
+        """
+        coerced = None
+        for param in self._integer_params.get(tool_name, ()):
+            value = arguments.get(param)
+            if isinstance(value, str):
+                try:
+                    number = int(value.strip())
+                except ValueError:
+                    continue
+                if coerced is None:
+                    coerced = dict(arguments)
+                coerced[param] = number
+        return arguments if coerced is None else coerced
+    
+    def _log_tool_call(self, tool_name: str, arguments: Mapping[str, Any], note: str = ""):
+        """Print a tool call's progress line."""
+        display = arguments.get(self.DISPLAY_FIELD.get(tool_name), "executing")
+        print(f"  🛠️  {tool_name}: {display}{note}")
+    
+    def _store_artifact(self, tool_result: str) -> str:
+        """Keep a large tool result aside and return a preview citing its id."""
+        artifact_id = store_artifact(tool_result)
+        if artifact_id is None:
+            return tool_result
+        return (
+            f"{tool_result[:self.ARTIFACT_PREVIEW_CHARS]}\n...[{len(tool_result)} characters in total; "
+            f"call retrieve_artifact with id '{artifact_id}' and an offset to read more]"
+        )
+    
+    def _start_tool_call(self, tool_call: Dict, semaphore: asyncio.Semaphore,
+                         started: Dict[Tuple[str, str], asyncio.Task]) -> asyncio.Task:
+        """Start a tool call as a task.
+        
+        started maps (name, arguments) to the round's running calls; a call
+        identical to one of them reuses its result under its own id
+        instead of running the tool again.
+        """
+        function = tool_call.get("function") or {}
+        key = (function.get("name"), function.get("arguments"))
+        first = started.get(key)
+        if first is None:
+            task = started[key] = asyncio.ensure_future(self._execute_tool_call(tool_call, semaphore))
+            return task
+        return asyncio.ensure_future(self._shared_result(first, tool_call.get("id")))
+    
+    async def _shared_result(self, task: asyncio.Task, call_id: str) -> Dict[str, Any]:
+        """The result of an identical call's task, answered under call_id."""
+        return dict(await task, tool_call_id=call_id)
+    
+    def _tool_starter(self) -> Callable[[Dict], asyncio.Task]:
+        """Return a function that starts one round's tool calls.
         
-        return results
+        The calls it starts share the round's concurrency limit and its
+        record of started calls, so identical calls run only once.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+        started = {}
+        return lambda tool_call: self._start_tool_call(tool_call, semaphore, started)
+    
+    async def _execute_tool_calls(self, tool_calls: List[Dict]) -> List[Dict[str, Any]]:
+        """Execute tool calls concurrently and return results in call order."""
+        start = self._tool_starter()
+        return await asyncio.gather(*(start(tool_call) for tool_call in tool_calls))
     
-    def chat(self, message: str) -> str:
+    async def _stream_completion(self, messages: List[Dict]) -> Tuple[Dict[str, Any], List[asyncio.Task]]:
+        """Stream one completion, printing content as it arrives.
+        
+        Each tool call is started as soon as its arguments are complete,
+        which is when the next call begins or the stream ends, so tools run
+        while the model is still generating. Returns the assembled assistant
+        message, including any tool calls, and the tasks running those calls
+        in call order.
+        """
+        # Call OpenAI Chat Completions API with tool support
+        stream = await self.client.chat.completions.create(
+            model=self.config["model"],           # AI model to use (e.g., gpt-4, gpt-3.5-turbo)
+            messages=messages,                    # Conversation history as list of message dicts
+            temperature=self.config["temperature"], # Randomness (0.0-2.0, lower = more deterministic)
+            tools=self.tool_schemas,              # Available tools in OpenAI function calling format
+            tool_choice="auto",                   # Let AI decide whether to call tools ("auto", "none", or specific tool)
+            stream=True                           # Receive the reply as incremental chunks
+        )
+        
+        content_parts = []
+        tool_calls = {}
+        tool_tasks = []
+        start = self._tool_starter()
+        
+        def start_complete_calls():
+            for index in sorted(tool_calls)[len(tool_tasks):]:
+                tool_tasks.append(start(tool_calls[index]))
+        
+        # Close the stream when done so its connection returns to the pool
+        try:
+            async with stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    # Each chunk carries a delta: a piece of content and/or pieces of tool calls
+                    delta = chunk.choices[0].delta
+                    
+                    content = delta.content
+                    if content:
+                        self._emit_content(content_parts, content)
+                    
+                    # Tool calls arrive in fragments keyed by index: the first fragment
+                    # has the id and function name, later ones extend the JSON arguments
+                    for tc in delta.tool_calls or []:
+                        if tc.index not in tool_calls:
+                            # Earlier calls are complete once a new one begins
+                            start_complete_calls()
+                        call = tool_calls.setdefault(tc.index, {
+                            "id": None,
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""}
+                        })
+                        if tc.id:
+                            call["id"] = tc.id
+                        fragment = tc.function
+                        if fragment:
+                            function = call["function"]
+                            if fragment.name:
+                                function["name"] += fragment.name
+                            if fragment.arguments:
+                                function["arguments"] += fragment.arguments
+        except BaseException:
+            for task in tool_tasks:
+                task.cancel()
+            raise
+        
+        start_complete_calls()
+        assistant_message = self._finish_reply(
+            content_parts, [tool_calls[index] for index in sorted(tool_calls)]
+        )
+        return assistant_message, tool_tasks
+    
+    def _emit_content(self, content_parts: List[str], content: str):
+        """Print a streamed piece of the reply and keep it for the message."""
+        if not content_parts:
+            print("🤖 Response: ", end="", flush=True)
+        print(content, end="", flush=True)
+        content_parts.append(content)
+    
+    def _finish_reply(self, content_parts: List[str], tool_calls: List[Dict]) -> Dict[str, Any]:
+        """End a streamed reply's line and assemble its assistant message."""
+        if content_parts:
+            print()
+        
+        # An empty reply carries no content field rather than an empty string
+        assistant_message = {"role": "assistant"}
+        if content_parts:
+            assistant_message["content"] = "".join(content_parts)
+        if tool_calls:
+            assistant_message["tool_calls"] = tool_calls
+        return assistant_message
+    
+    async def _stream_response(self, messages: List[Dict], previous_response_id: Optional[str]
+                               ) -> Tuple[Dict[str, Any], List[asyncio.Task], str]:
+        """Stream one Responses API turn, uploading only what the server lacks.
+        
+        The server keeps the conversation under previous_response_id, so
+        after the first round only the tool results that follow the last
+        assistant message are sent. Tool calls start as soon as each one is
+        done. Returns the assistant message in chat format, the tasks running
+        its tool calls in call order, and the new response id.
+        """
+        if previous_response_id is None:
+            new_messages = messages
+        else:
+            last_reply = max(i for i, m in enumerate(messages) if m["role"] == "assistant")
+            new_messages = messages[last_reply + 1:]
+        request = {
+            "model": self.config["model"],
+            "input": [
+                {"type": "function_call_output", "call_id": m["tool_call_id"], "output": m["content"]}
+                if m["role"] == "tool" else {"role": m["role"], "content": m["content"]}
+                for m in new_messages
+            ],
+            "temperature": self.config["temperature"],
+            "tools": self._response_tools,
+            "store": True,
+            "stream": True
+        }
+        if previous_response_id is not None:
+            request["previous_response_id"] = previous_response_id
+        stream = await self.client.responses.create(**request)
+        
+        content_parts = []
+        tool_calls = []
+        tool_tasks = []
+        response_id = previous_response_id
+        start = self._tool_starter()
+        try:
+            async with stream:
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        if event.delta:
+                            self._emit_content(content_parts, event.delta)
+                    elif event.type == "response.output_item.done" and event.item.type == "function_call":
+                        call = {
+                            "id": event.item.call_id,
+                            "type": "function",
+                            "function": {"name": event.item.name, "arguments": event.item.arguments}
+                        }
+                        tool_calls.append(call)
+                        tool_tasks.append(start(call))
+                    elif event.type == "response.created":
+                        response_id = event.response.id
+        except BaseException:
+            for task in tool_tasks:
+                task.cancel()
+            raise
+        
+        return self._finish_reply(content_parts, tool_calls), tool_tasks, response_id
+    
+    def chat(self, message: str, use_cache: bool = True) -> str:
         """Main chat function with tool chaining."""
+        return self._get_loop().run_until_complete(self.chat_async(message, use_cache))
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """The event loop behind the sync wrappers, created on first use."""
+        # Reuse one loop across chats: the async client's pooled
+        # connections belong to the loop that opened them
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+    
+    def close(self):
+        """Close the API client and the event loop used by chat()."""
+        if self._loop is None:
+            return
+        self._loop.run_until_complete(self.client.close())
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+        self._loop = None
+    
+    async def chat_async(self, message: str, use_cache: bool = True) -> str:
+        """Async chat with tool chaining; tool calls within a round run concurrently.
+        
+        With a semantic cache configured and use_cache set, a question close
+        enough to an earlier one is answered from the cache without any rounds.
+        """
+        cache = self.response_cache if use_cache else None
+        embedding = await cache.embed(message) if cache else None
+        if embedding is not None:
+            cached = cache.lookup(embedding)
+            if cached is not None:
+                print(f"🤖 Response (cached): {cached}")
+                return cached
+        
         # Prepare messages
-        messages = [
-            {"role": "system", "content": self.config["system_prompt"]},
-            {"role": "user", "content": message}
-        ]
+        messages = [self._system_msg, {"role": "user", "content": message}]
+        with chat_state():
+            response = await self._run_rounds(messages)
+        
+        if embedding is not None:
+            # Cache the model's last real answer, not the termination sentinel
+            answer = next((m["content"] for m in reversed(messages)
+                           if m["role"] == "assistant" and m.get("content")), None)
+            if answer:
+                cache.add(message, embedding, answer)
+        return response
+    
+    def _detect_tool_call_loop(self, round_signatures: deque, tool_calls: List[Dict]) -> bool:
+        """Record this round's tool calls; True if the same set was already seen twice."""
+        signature = hash(tuple(
+            (tc["function"]["name"], tc["function"]["arguments"]) for tc in tool_calls
+        ))
+        if round_signatures.count(signature) >= 2:
+            return True
+        round_signatures.append(signature)
+        return False
+    
+    async def _run_tool_round(self, messages: List[Dict], assistant_message: Dict[str, Any],
+                              tool_tasks: Optional[List[asyncio.Task]] = None):
+        """Append an assistant tool-call message and the results of its calls.
         
-        tool_schemas = [tool.get_schema() for tool in self.tools.values()]
+        tool_tasks, if given, are the calls already started in call order.
+        """
+        messages.append(assistant_message)
+        if tool_tasks is None:
+            tool_results = await self._execute_tool_calls(assistant_message["tool_calls"])
+        else:
+            tool_results = await asyncio.gather(*tool_tasks)
+        
+        # Add tool results to messages
+        for result in tool_results:
+            messages.append({
+                "role": "tool",
+                "tool_call_id": result["tool_call_id"],
+                "name": result["name"],
+                "content": result["content"]
+            })
+        self._compact_history(messages)
+    
+    async def _run_rounds(self, messages: List[Dict]) -> str:
+        """Run completion and tool rounds until the model stops or max_rounds."""
+        # Hashes of recent rounds' tool calls, for cheap loop detection
+        round_signatures = deque(maxlen=5)
+        # Server-side conversation state, when using the Responses API
+        previous_response_id = None
         
         for round_num in range(1, self.max_rounds + 1):
             self.current_round = round_num
             
             self._show_progress(round_num, "Thinking...")
+            await self.rate_limiter.acquire(self._estimate_tokens(messages))
             
             try:
-                # Call OpenAI Chat Completions API with tool support
-                response = self.client.chat.completions.create(
-                    model=self.config["model"],           # AI model to use (e.g., gpt-4, gpt-3.5-turbo)
-                    messages=messages,                    # Conversation history as list of message dicts
-                    temperature=self.config["temperature"], # Randomness (0.0-2.0, lower = more deterministic)
-                    tools=tool_schemas,                   # Available tools in OpenAI function calling format
-                    tool_choice="auto"                    # Let AI decide whether to call tools ("auto", "none", or specific tool)
-                )
+                if self.use_responses_api:
+                    assistant_message, tool_tasks, previous_response_id = await self._stream_response(
+                        messages, previous_response_id
+                    )
+                else:
+                    assistant_message, tool_tasks = await self._stream_completion(messages)
             except Exception as e:
                 return f"Error calling OpenAI API: {str(e)}"
             
-            # Extract the first choice from the response
-            # choices is a list of response alternatives (usually just one)
-            choice = response.choices[0]
-            
-            # Get the message object containing the AI's response
-            # message contains content, role, and potentially tool_calls
-            message_obj = choice.message
-            
-            # Add assistant response to messages
-            assistant_message = {
-                "role": "assistant",
-                "content": message_obj.content or ""
-            }
-            
             # Check if the AI wants to call any tools
-            # tool_calls is a list of ToolCall objects when the AI decides to use tools
-            if hasattr(message_obj, 'tool_calls') and message_obj.tool_calls:
-                # Convert tool_calls to the expected format for message history
-                # Each tool_call has: id, type, and function (name + arguments)
-                assistant_message["tool_calls"] = [
-                    {
-                        "id": tc.id,           # Unique identifier for this tool call
-                        "type": tc.type,       # Always "function" for function calls
-                        "function": {
-                            "name": tc.function.name,        # Name of the function to call
-                            "arguments": tc.function.arguments # JSON string of arguments
-                        }
-                    }
-                    for tc in message_obj.tool_calls
-                ]
+            if "tool_calls" in assistant_message:
+                if self._detect_tool_call_loop(round_signatures, assistant_message["tool_calls"]):
+                    for task in tool_tasks:
+                        task.cancel()
+                    self._show_progress(round_num, "Tool call loop detected, stopping")
+                    return "⚠️  Stopped: the model kept repeating the same tool calls."
                 
-                messages.append(assistant_message)
-                
-                # Execute tools
+                # Wait for the tools, which started while the reply streamed
                 self._show_progress(round_num, "Executing tools...")
-                tool_results = self._execute_tool_calls(assistant_message["tool_calls"])
-                
-                # Add tool results to messages
-                for result in tool_results:
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": result["tool_call_id"],
-                        "name": result["name"],
-                        "content": result["content"]
-                    })
+                await self._run_tool_round(messages, assistant_message, tool_tasks)
                 
                 # Continue to next round
                 continue
             else:
-                # No tool calls
+                # No tool calls; the content was printed while streaming
                 messages.append(assistant_message)
-                print(f"🤖 Response: {message_obj.content}")
-                if not message_obj.content:
+                if "content" not in assistant_message:
                     # Only terminate if there's literally no content
                     return "No response"
         
@@ -191,6 +747,137 @@ class ToolAgent:
         else:
             return f"⚠️  Maximum rounds ({self.max_rounds}) reached. No final response generated."
     
+    def chat_batch(self, queries: List[str]) -> List[str]:
+        """Answer independent queries through the Batch API; see chat_batch_async."""
+        return self._get_loop().run_until_complete(self.chat_batch_async(queries))
+    
+    async def chat_batch_async(self, queries: List[str]) -> List[str]:
+        """Answer independent queries with one Batch API job per round.
+        
+        Batch jobs cost less than live requests but may take minutes to
+        hours, so this suits bulk runs rather than interactive use. Queries
+        whose reply asks for tools have the tools run locally and go into
+        the next round's batch, until every query has an answer or
+        max_rounds is reached. Responses are returned in query order.
+        """
+        with chat_state():
+            return await self._run_batch_rounds(queries)
+    
+    async def _run_batch_rounds(self, queries: List[str]) -> List[str]:
+        """Run Batch API and tool rounds for chat_batch_async."""
+        conversations = {
+            f"query-{i}": [self._system_msg, {"role": "user", "content": query}]
+            for i, query in enumerate(queries)
+        }
+        signatures = {custom_id: deque(maxlen=5) for custom_id in conversations}
+        responses = {}
+        pending = list(conversations)
+        
+        for round_num in range(1, self.max_rounds + 1):
+            if not pending:
+                break
+            self.current_round = round_num
+            self._show_progress(round_num, f"Submitting batch of {len(pending)} requests...")
+            try:
+                replies = await self._run_batch({cid: conversations[cid] for cid in pending})
+            except Exception as e:
+                for custom_id in pending:
+                    responses[custom_id] = f"Error calling OpenAI Batch API: {str(e)}"
+                break
+            
+            tool_rounds = []
+            for custom_id in pending:
+                assistant_message = replies.get(custom_id)
+                if isinstance(assistant_message, str):
+                    responses[custom_id] = assistant_message
+                elif "tool_calls" in assistant_message:
+                    if self._detect_tool_call_loop(signatures[custom_id], assistant_message["tool_calls"]):
+                        responses[custom_id] = "⚠️  Stopped: the model kept repeating the same tool calls."
+                    else:
+                        tool_rounds.append(custom_id)
+                else:
+                    conversations[custom_id].append(assistant_message)
+                    responses[custom_id] = assistant_message.get("content", "No response")
+            
+            if tool_rounds:
+                self._show_progress(round_num, "Executing tools...")
+                await asyncio.gather(*(
+                    self._run_tool_round(conversations[custom_id], replies[custom_id])
+                    for custom_id in tool_rounds
+                ))
+            pending = tool_rounds
+        
+        for custom_id in pending:
+            responses[custom_id] = f"⚠️  Maximum rounds ({self.max_rounds}) reached. No final response generated."
+        return [responses[custom_id] for custom_id in conversations]
+    
+    async def _run_batch(self, conversations: Dict[str, List[Dict]]) -> Dict[str, Any]:
+        """Submit one completion per conversation as a batch job and wait for it.
+        
+        Returns the assistant message for each custom_id, or an error string
+        for requests the job could not complete.
+        """
+        tools = [dict(schema) for schema in self.tool_schemas]
+        lines = [
+            json_dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.config["model"],
+                    "messages": messages,
+                    "temperature": self.config["temperature"],
+                    "tools": tools,
+                    "tool_choice": "auto"
+                }
+            })
+            for custom_id, messages in conversations.items()
+        ]
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", b"\n".join(lines)), purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        # Poll with exponential backoff; jobs rarely finish in seconds
+        delay = self.BATCH_POLL_INITIAL
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.BATCH_POLL_MAX)
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        replies = {custom_id: f"Error: Batch request not completed (job {batch.status})"
+                   for custom_id in conversations}
+        # Successful requests go to the output file and failed ones to the
+        # error file; a job may have either, both or neither
+        items = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                output = await self.client.files.content(file_id)
+                items.extend(json_loads(line) for line in output.text.splitlines() if line)
+        for item in items:
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                error = item.get("error") or (response.get("body") or {}).get("error")
+                if isinstance(error, dict):
+                    error = error.get("message") or error.get("code") or error
+                replies[item["custom_id"]] = f"Error: Batch request failed: {error}"
+                continue
+            message = response["body"]["choices"][0]["message"]
+            assistant_message = {"role": "assistant"}
+            if message.get("content"):
+                assistant_message["content"] = message["content"]
+            if message.get("tool_calls"):
+                assistant_message["tool_calls"] = [
+                    {"id": tc["id"], "type": "function", "function": tc["function"]}
+                    for tc in message["tool_calls"]
+                ]
+            replies[item["custom_id"]] = assistant_message
+        return replies
+    
     def run_interactive(self):
         """Run interactive CLI mode."""
         print("🤖 ToolAgent Demo - AI with Tool Chaining")
@@ -215,6 +902,7 @@ class ToolAgent:
                 
                 if message:
                     print()
+                    self._reload_config()
                     response = self.chat(message)
                     print(f"\n{response}\n")
                     